@@ -1,6 +1,18 @@
 """Gemini-powered deep analysis of top-scored posts."""
 
+import functools
+import hashlib
 import json
+import math
+import os
+import random
+import re
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import db, fastjson
 
 
 ANALYSIS_PROMPT = """Analyze these community posts about "{topic}" and extract user pain points.
@@ -28,78 +40,172 @@ Output ONLY a JSON array of pain point objects. No other text.
 Posts data:
 {posts_json}"""
 
+# Template split around the posts payload: the prefix is formatted once per
+# run, and each batch prompt is a plain concatenation
+_PROMPT_PREFIX, _PROMPT_SUFFIX = ANALYSIS_PROMPT.split("{posts_json}")
+
+# MinHash-LSH for pain-point dedup. 32 bands x 2 rows puts the LSH threshold
+# around 0.18, so pairs at the 0.5 Jaccard cut-off collide in some band with
+# ~99.9% probability; candidates are then compared signature-to-signature.
+_MINHASH_PERM = 64
+_LSH_BANDS = 32
+_LSH_ROWS = _MINHASH_PERM // _LSH_BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_MINHASH_COEFFS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(_MINHASH_PERM)
+]
+del _rng
+
+# Source URL markers → platform, matched in one regex scan per URL
+_PLATFORM_MAP = {
+    "news.ycombinator.com": "hn",
+    "hn_": "hn",
+    "reddit.com": "reddit",
+    "producthunt.com": "producthunt",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+    "g2.com": "g2",
+    "capterra.com": "capterra",
+}
+_PLATFORM_RE = re.compile("|".join(re.escape(m) for m in _PLATFORM_MAP), re.IGNORECASE)
+
+# Markdown code fence around a JSON response: ```json ... ```
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*(?:```\s*)?$", re.DOTALL)
+
+# Terminal states of a Gemini batch job
+BATCH_DONE_STATES = {
+    "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED",
+}
+
 
 def analyze_posts(posts, topic, cfg):
     """Run Gemini analysis on a list of posts. Returns list of pain points."""
-    try:
-        from google import genai
-    except ImportError:
-        print("  [Gemini] google-genai not installed. Run: pip install google-genai")
-        return []
-
     api_key = cfg["gemini"].get("api_key", "")
     if not api_key:
         print("  [Gemini] No API key. Set GEMINI_API_KEY env var.")
         return []
 
-    client = genai.Client(api_key=api_key)
+    try:
+        client = _get_client(api_key)
+    except ImportError:
+        print("  [Gemini] google-genai not installed. Run: pip install google-genai")
+        return []
     model_name = cfg["gemini"].get("model", "gemini-2.0-flash")
 
     # Prepare posts data — only send essential fields to save tokens
-    posts_data = []
-    for p in posts:
-        posts_data.append({
-            "url": p.get("url", ""),
-            "title": p.get("title", ""),
-            "body": p.get("body", "")[:2000],  # Truncate long posts
-            "author": p.get("author", ""),
-            "points": p.get("points", 0),
-            "platform": p.get("platform", ""),
-            "community": p.get("community", ""),
-            "pain_score": p.get("pain_score", 0),
-            "demand_score": p.get("demand_score", 0),
-        })
+    # (pulled column by column, then zipped into one dict per post)
+    urls = [p.get("url", "") for p in posts]
+    titles = [p.get("title", "") for p in posts]
+    bodies = [p.get("body", "") for p in posts]  # Already capped by db.insert_posts
+    authors = [p.get("author", "") for p in posts]
+    points = [p.get("points", 0) for p in posts]
+    platforms = [p.get("platform", "") for p in posts]
+    communities = [p.get("community", "") for p in posts]
+    pain_scores = [p.get("pain_score", 0) for p in posts]
+    demand_scores = [p.get("demand_score", 0) for p in posts]
+    posts_data = [
+        {"url": u, "title": t, "body": b, "author": a, "points": pts, "platform": pl,
+         "community": c, "pain_score": ps, "demand_score": ds}
+        for u, t, b, a, pts, pl, c, ps, ds in zip(
+            urls, titles, bodies, authors, points, platforms, communities,
+            pain_scores, demand_scores)
+    ]
 
     # Split into batches if too many posts (Gemini context limit)
     batch_size = 25
-    all_pain_points = []
-
-    for i in range(0, len(posts_data), batch_size):
-        batch = posts_data[i:i + batch_size]
-        prompt = ANALYSIS_PROMPT.format(
-            topic=topic,
-            posts_json=json.dumps(batch, ensure_ascii=False, indent=2)
-        )
-
-        print(f"  [Gemini] Analyzing batch {i // batch_size + 1} ({len(batch)} posts)...")
+    batches = [posts_data[i:i + batch_size] for i in range(0, len(posts_data), batch_size)]
+    prompt_prefix = _PROMPT_PREFIX.format(topic=topic)
+    # Compact JSON: whitespace costs prompt tokens and the model parses it just as well
+    prompts = [prompt_prefix + fastjson.dumps(batch) + _PROMPT_SUFFIX for batch in batches]
+
+    # Exact cache first (same prompt seen before), then, if enabled, the
+    # semantic cache (near-identical batch of mostly the same posts analyzed
+    # before) — both skip the generate call
+    use_cache = cfg["gemini"].get("semantic_cache", False)
+    threshold = cfg["gemini"].get("semantic_cache_threshold", 0.92)
+    min_overlap = cfg["gemini"].get("semantic_cache_min_url_overlap", 0.8)
+    prompt_keys = [_prompt_key(model_name, prompt) for prompt in prompts]
+    results = {}     # batch index -> list of pain points (None = failed)
+    texts = {}       # batch index -> raw response text still to parse
+    embeddings = {}  # batch index -> embedding, for batches to cache afterwards
+    pending = []
+    for idx in range(len(batches)):
+        cached_text = db.get_cached_response(prompt_keys[idx])
+        if cached_text is not None:
+            print(f"  [Gemini] Batch {idx + 1} served from prompt cache")
+            texts[idx] = cached_text
+            continue
+        pending.append(idx)
+
+    def _semantic_hit(idx):
+        """Embed batch idx and look it up in the semantic cache. True on a hit."""
+        batch = batches[idx]
+        vec = _embed_batch(client, batch, cfg)
+        if not vec:
+            return False
+        cached = _semantic_cache_lookup(vec, [p["url"] for p in batch], topic, model_name,
+                                        threshold, min_overlap)
+        if cached is not None:
+            print(f"  [Gemini] Batch {idx + 1} served from cache ({len(cached)} pain points)")
+            results[idx] = cached
+            return True
+        embeddings[idx] = vec
+        return False
+
+    workers = max(1, min(cfg["gemini"].get("max_concurrent_batches", 4), len(pending)))
+    if pending and cfg["gemini"].get("batch_api"):
+        if use_cache:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                hits = list(ex.map(_semantic_hit, pending))
+            pending = [idx for idx, hit in zip(pending, hits) if not hit]
+        if pending:
+            # One async job for all batches — half price, runs server-side in parallel
+            print(f"  [Gemini] Submitting {len(pending)} batches as one batch job...")
+            job_texts = _run_batch_job(client, model_name, [prompts[i] for i in pending], cfg)
+            for job_idx, text in job_texts.items():
+                texts[pending[job_idx]] = text
+    elif pending:
+        # Each batch is an independent multi-second request — run them concurrently
+        # (the semantic cache lookup too, so its embedding call overlaps the others)
+        def _run_batch(idx):
+            if use_cache and _semantic_hit(idx):
+                return idx, None
+            print(f"  [Gemini] Analyzing batch {idx + 1} ({len(batches[idx])} posts)...")
+            try:
+                response = client.models.generate_content(model=model_name, contents=prompts[idx])
+            except Exception as e:
+                print(f"  [Gemini] API error in batch {idx + 1}: {e}")
+                return idx, None
+            print(f"  [Gemini] Batch {idx + 1} done")
+            return idx, response.text
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for fut in as_completed([ex.submit(_run_batch, idx) for idx in pending]):
+                idx, text = fut.result()
+                if text is not None:
+                    texts[idx] = text
+
+    for idx, text in texts.items():
+        results[idx], complete = _parse_pain_points(text)
+        # Salvaged (truncated) responses aren't cached, so a later run retries them
+        if not complete:
+            embeddings.pop(idx, None)
+        elif idx in pending:
+            db.save_cached_response(prompt_keys[idx], text)
 
-        try:
-            response = client.models.generate_content(model=model_name, contents=prompt)
-            text = response.text.strip()
-
-            # Strip markdown code fences if present
-            if text.startswith("```"):
-                text = text.split("\n", 1)[1] if "\n" in text else text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-            if text.startswith("json"):
-                text = text[4:]
-            text = text.strip()
-
-            pain_points = json.loads(text)
-            if isinstance(pain_points, list):
-                all_pain_points.extend(pain_points)
-                print(f"  [Gemini] Found {len(pain_points)} pain points in batch")
-            else:
-                print(f"  [Gemini] Unexpected response format: {type(pain_points)}")
-
-        except json.JSONDecodeError as e:
-            print(f"  [Gemini] JSON parse error: {e}")
-            print(f"  [Gemini] Raw response: {text[:500]}")
-        except Exception as e:
-            print(f"  [Gemini] API error: {e}")
+    all_pain_points = []
+    for idx in sorted(results):
+        pain_points = results[idx]
+        if pain_points is None:
+            continue
+        all_pain_points.extend(pain_points)
+        if idx in embeddings:
+            db.save_analysis_cache(topic, model_name, embeddings[idx],
+                                   [p["url"] for p in batches[idx]], pain_points)
 
-    # Deduplicate pain points using Jaccard word-level similarity
+    # Deduplicate pain points using MinHash-estimated Jaccard similarity
     unique_points = _deduplicate_pain_points(all_pain_points)
 
     # Detect cross-platform signals
@@ -118,39 +224,210 @@ def analyze_posts(posts, topic, cfg):
     return unique_points
 
 
-def _jaccard_similarity(text_a, text_b):
-    """Compute Jaccard similarity between two texts at word level."""
-    words_a = set(text_a.lower().split())
-    words_b = set(text_b.lower().split())
-    if not words_a or not words_b:
-        return 0.0
-    intersection = words_a & words_b
-    union = words_a | words_b
-    return len(intersection) / len(union)
+def _prompt_key(model_name, prompt):
+    """Stable exact-match cache key for a rendered prompt."""
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key):
+    """Shared Gemini client per API key, so its HTTP connection pool is reused."""
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+
+def _embed_batch(client, batch, cfg):
+    """Embed a batch's titles + body openings. Returns a vector, or None on error."""
+    text = "\n".join(f"{p['title']} {p['body'][:200]}" for p in batch)
+    model = cfg["gemini"].get("embedding_model", "text-embedding-004")
+    try:
+        result = client.models.embed_content(model=model, contents=text)
+        return list(result.embeddings[0].values)
+    except Exception as e:
+        print(f"  [Gemini] Embedding error, skipping cache: {e}")
+        return None
+
+
+def _semantic_cache_lookup(vec, urls, topic, model_name, threshold, min_overlap=0.8):
+    """Return cached pain points of the most similar earlier batch, if close enough.
+
+    Only batches containing at least min_overlap of `urls` qualify, so a batch
+    of different posts never inherits pain points sourced from other posts.
+    """
+    q_norm = math.sqrt(sum(x * x for x in vec))
+    urls = set(urls)
+    if not q_norm or not urls:
+        return None
+
+    best, best_sim = None, threshold
+    for cached_vec, cached_urls, pain_points in db.get_analysis_cache(topic, model_name):
+        if len(cached_vec) != len(vec):
+            continue
+        if len(urls.intersection(cached_urls)) / len(urls) < min_overlap:
+            continue
+        norm = math.sqrt(sum(x * x for x in cached_vec))
+        if not norm:
+            continue
+        sim = sum(a * b for a, b in zip(vec, cached_vec)) / (norm * q_norm)
+        if sim >= best_sim:
+            best, best_sim = pain_points, sim
+    return best
+
+
+def _run_batch_job(client, model_name, prompts, cfg):
+    """Run prompts through the Gemini Batch API. Returns {batch index: response text}.
+
+    Each prompt becomes one JSONL line keyed "batch_{i}"; the job is polled
+    until it reaches a terminal state (or batch_max_wait_minutes passes), then
+    the output file is read back. Any failure returns the texts read so far.
+    """
+    poll_seconds = cfg["gemini"].get("batch_poll_seconds", 30)
+    max_wait = cfg["gemini"].get("batch_max_wait_minutes", 120) * 60
+
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", encoding="utf-8",
+                                     delete=False) as f:
+        for i, prompt in enumerate(prompts):
+            f.write(fastjson.dumps({
+                "key": f"batch_{i}",
+                "request": {"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+            }) + "\n")
+        input_path = f.name
+
+    texts = {}
+    try:
+        uploaded = client.files.upload(
+            file=input_path,
+            config={"display_name": "pain-miner-batch", "mime_type": "jsonl"},
+        )
+        job = client.batches.create(model=model_name, src=uploaded.name,
+                                    config={"display_name": "pain-miner-batch"})
+        print(f"  [Gemini] Batch job {job.name} created, polling every {poll_seconds}s...")
+
+        deadline = time.monotonic() + max_wait
+        while job.state.name not in BATCH_DONE_STATES:
+            if time.monotonic() >= deadline:
+                print(f"  [Gemini] Batch job {job.name} still {job.state.name} "
+                      f"after {max_wait // 60} min, giving up")
+                try:
+                    client.batches.cancel(name=job.name)
+                except Exception:
+                    pass
+                return {}
+            time.sleep(poll_seconds)
+            job = client.batches.get(name=job.name)
+
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            print(f"  [Gemini] Batch job ended with {job.state.name}")
+            return {}
+
+        content = client.files.download(file=job.dest.file_name)
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                result = fastjson.loads(line)
+            except json.JSONDecodeError:
+                print(f"  [Gemini] Skipping malformed batch output line: {line[:200]}")
+                continue
+            key = result.get("key", "") if isinstance(result, dict) else ""
+            if not key.startswith("batch_"):
+                continue
+            idx = int(key[len("batch_"):])
+            try:
+                texts[idx] = result["response"]["candidates"][0]["content"]["parts"][0]["text"]
+            except (KeyError, IndexError, TypeError):
+                print(f"  [Gemini] Batch {idx + 1} failed: {result.get('error', 'no response')}")
+    except Exception as e:
+        print(f"  [Gemini] Batch API error: {e}")
+    finally:
+        os.unlink(input_path)
+    return texts
+
+
+def _parse_pain_points(text):
+    """Parse a Gemini response. Returns (pain points or None on failure, complete).
+
+    complete is False when the response was cut off and only its complete
+    items could be salvaged.
+    """
+    # Strip markdown code fences if present (closing fence may be cut off)
+    text = text or ""
+    m = _FENCE_RE.match(text)
+    text = m.group(1) if m else text.strip()
+
+    try:
+        pain_points = fastjson.loads(text)
+    except json.JSONDecodeError as e:
+        # Likely cut off at the output token limit — keep the complete objects
+        pain_points = list(_parse_partial(text))
+        if not pain_points:
+            print(f"  [Gemini] JSON parse error: {e}")
+            print(f"  [Gemini] Raw response: {text[:500]}")
+            return None, False
+        print(f"  [Gemini] Truncated response, salvaged {len(pain_points)} complete items")
+        complete = False
+    else:
+        complete = True
+
+    if not isinstance(pain_points, list):
+        print(f"  [Gemini] Unexpected response format: {type(pain_points)}")
+        return None, False
+
+    print(f"  [Gemini] Found {len(pain_points)} pain points in batch")
+    return pain_points, complete
+
+
+def _shingles(text):
+    """Character 4-grams of already-normalized text (whole text if shorter)."""
+    if len(text) < 4:
+        return {text}
+    return {text[i:i + 4] for i in range(len(text) - 3)}
+
+
+def _minhash(shingles):
+    """MinHash signature of a shingle set (_MINHASH_PERM hashed permutations)."""
+    hashes = [zlib.crc32(sh.encode("utf-8")) for sh in shingles]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _MINHASH_COEFFS]
 
 
 def _deduplicate_pain_points(pain_points, threshold=0.5):
-    """Merge pain points with Jaccard similarity above threshold."""
+    """Merge pain points whose estimated Jaccard similarity is above threshold."""
     if not pain_points:
         return []
 
-    clusters = []  # Each cluster is a list of pain points to merge
+    clusters = []    # (representative signature, pain points to merge)
+    buckets = {}     # (band, band signature) -> indices of clusters whose representative hashed there
+    signatures = {}  # normalized description -> (signature, band keys); batches repeat descriptions
 
     for pp in pain_points:
-        desc = pp.get("description", "")
-        merged = False
-        for cluster in clusters:
-            representative = cluster[0]
-            if _jaccard_similarity(desc, representative.get("description", "")) >= threshold:
-                cluster.append(pp)
-                merged = True
+        text = " ".join(pp.get("description", "").lower().split())
+        if not text:
+            clusters.append((None, [pp]))  # Empty descriptions never match anything
+            continue
+
+        # MinHash over character 4-gram shingles, computed once per distinct text
+        if text not in signatures:
+            sig = _minhash(_shingles(text))
+            signatures[text] = (sig, [(b, tuple(sig[b * _LSH_ROWS:(b + 1) * _LSH_ROWS]))
+                                      for b in range(_LSH_BANDS)])
+        sig, keys = signatures[text]
+
+        # Only clusters sharing an LSH band are candidates; the fraction of
+        # agreeing signature slots estimates their shingle Jaccard similarity
+        candidates = sorted({ci for key in keys for ci in buckets.get(key, ())})
+        for ci in candidates:
+            rep_sig, members = clusters[ci]
+            if sum(a == b for a, b in zip(sig, rep_sig)) / _MINHASH_PERM >= threshold:
+                members.append(pp)
                 break
-        if not merged:
-            clusters.append([pp])
+        else:
+            for key in keys:
+                buckets.setdefault(key, []).append(len(clusters))
+            clusters.append((sig, [pp]))
 
     # Merge each cluster into a single pain point
     merged_points = []
-    for cluster in clusters:
+    for _, cluster in clusters:
         if len(cluster) == 1:
             merged_points.append(cluster[0])
             continue
@@ -173,7 +450,8 @@ def _deduplicate_pain_points(pain_points, threshold=0.5):
                 if not base.get("payment_quote") and other.get("payment_quote"):
                     base["payment_quote"] = other["payment_quote"]
 
-        base["source_urls"] = list(dict.fromkeys(all_urls))  # dedupe preserving order
+        seen = set()  # dedupe preserving order
+        base["source_urls"] = [u for u in all_urls if not (u in seen or seen.add(u))]
         base["representative_quotes"] = all_quotes[:5]
         base["unique_users"] = max_users
         base["emotional_intensity"] = max_intensity
@@ -183,31 +461,34 @@ def _deduplicate_pain_points(pain_points, threshold=0.5):
     return merged_points
 
 
-def _extract_platforms(source_urls):
+def _classify_urls(urls):
+    """Map each distinct URL to its platform name (or None) in a single pass."""
+    url_platforms = {}
+    for url in urls:
+        if url not in url_platforms:
+            m = _PLATFORM_RE.search(url)
+            url_platforms[url] = _PLATFORM_MAP[m.group(0).lower()] if m else None
+    return url_platforms
+
+
+def _extract_platforms(source_urls, url_platforms=None):
     """Extract platform names from source URLs."""
-    platforms = set()
-    for url in source_urls:
-        url_lower = url.lower()
-        if "news.ycombinator.com" in url_lower or "hn_" in url_lower:
-            platforms.add("hn")
-        elif "reddit.com" in url_lower:
-            platforms.add("reddit")
-        elif "producthunt.com" in url_lower:
-            platforms.add("producthunt")
-        elif "twitter.com" in url_lower or "x.com" in url_lower:
-            platforms.add("twitter")
-        elif "g2.com" in url_lower:
-            platforms.add("g2")
-        elif "capterra.com" in url_lower:
-            platforms.add("capterra")
+    if url_platforms is None:
+        url_platforms = _classify_urls(source_urls)
+    platforms = {url_platforms[url] for url in source_urls}
+    platforms.discard(None)
     return platforms
 
 
 def _add_cross_platform_signals(pain_points):
     """Add platform_count and cross_platform_signal to each pain point."""
+    # Merged pain points share many URLs — classify each one once for the whole list
+    url_platforms = _classify_urls(
+        url for pp in pain_points for url in pp.get("source_urls", [])
+    )
     for pp in pain_points:
         urls = pp.get("source_urls", [])
-        platforms = _extract_platforms(urls)
+        platforms = _extract_platforms(urls, url_platforms)
         pp["platforms"] = sorted(platforms) if platforms else []
         pp["platform_count"] = len(platforms) if platforms else 1
         if pp["platform_count"] >= 3:
@@ -216,3 +497,22 @@ def _add_cross_platform_signals(pain_points):
             pp["cross_platform_signal"] = "moderate"
         else:
             pp["cross_platform_signal"] = "single"
+
+
+def _parse_partial(text):
+    """Yield each complete element of a JSON array, stopping at the first broken one."""
+    decoder = json.JSONDecoder()
+    idx = text.find("[")
+    if idx == -1:
+        return
+    idx += 1
+    while True:
+        while idx < len(text) and text[idx] in " \t\r\n,":
+            idx += 1
+        if idx >= len(text) or text[idx] == "]":
+            return
+        try:
+            item, idx = decoder.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            return
+        yield item
@@ -3,6 +3,7 @@
 import argparse
 import hashlib
 import json
+import logging
 import sys
 
 from . import config as config_mod
@@ -322,6 +323,14 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    # Source modules (Reddit, X) report progress through logging; show it like
+    # print. Only the package logger is configured, so library INFO logs stay hidden
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    pkg_log = logging.getLogger("pain_miner")
+    pkg_log.addHandler(handler)
+    pkg_log.setLevel(logging.INFO)
+
     cfg = config_mod.load_config(args.config)
 
     if args.command == "search":
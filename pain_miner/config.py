@@ -1,9 +1,17 @@
 """Load and merge config from YAML file + environment variables."""
 
+import functools
 import os
 import yaml
 from pathlib import Path
 
+from . import db
+
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml C bindings
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 
 DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "config.yaml"
 DEFAULT_ENV_PATH = Path(__file__).parent.parent / ".env"
@@ -27,12 +35,21 @@ def _load_dotenv(env_path=None):
 
 
 def load_config(config_path=None):
-    """Load config from YAML, then override with env vars."""
+    """Load config from YAML, then override with env vars.
+
+    Memoized per path: repeated calls return the same dict, which callers
+    treat as read-only.
+    """
+    return _load_config_cached(str(config_path) if config_path else "")
+
+
+@functools.lru_cache(maxsize=4)
+def _load_config_cached(config_path):
     _load_dotenv()
     path = Path(config_path) if config_path else DEFAULT_CONFIG_PATH
     if path.exists():
         with open(path) as f:
-            cfg = yaml.safe_load(f) or {}
+            cfg = yaml.load(f, Loader=_YamlLoader) or {}
     else:
         cfg = {}
 
@@ -54,6 +71,7 @@ def load_config(config_path=None):
     r.setdefault("time_filter", "month")
     r.setdefault("limit", 100)
     r.setdefault("comment_threshold", 10)
+    r.setdefault("comment_cache_hours", 24)
 
     ph = cfg["platforms"]["producthunt"]
     ph["developer_token"] = os.environ.get("PRODUCTHUNT_TOKEN", ph.get("developer_token", ""))
@@ -69,6 +87,14 @@ def load_config(config_path=None):
     g["api_key"] = os.environ.get("GEMINI_API_KEY", g.get("api_key", ""))
     g.setdefault("model", "gemini-2.0-flash")
     g.setdefault("max_posts_to_analyze", 50)
+    g.setdefault("max_concurrent_batches", 4)
+    g.setdefault("batch_api", False)
+    g.setdefault("batch_poll_seconds", 30)
+    g.setdefault("batch_max_wait_minutes", 120)
+    g.setdefault("semantic_cache", False)
+    g.setdefault("semantic_cache_threshold", 0.92)
+    g.setdefault("semantic_cache_min_url_overlap", 0.8)
+    g.setdefault("embedding_model", "text-embedding-004")
 
     s = cfg["scoring"]
     s.setdefault("engagement_weight", 0.3)
@@ -79,5 +105,7 @@ def load_config(config_path=None):
 
     cfg["search"].setdefault("max_post_age_days", 180)
     cfg["search"].setdefault("query_delay_seconds", 0.3)
+    cfg["search"].setdefault("parallel_queries", 4)
+    cfg["search"].setdefault("body_char_budget", db.ANALYSIS_BODY_LIMIT)
 
     return cfg
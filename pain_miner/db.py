@@ -1,191 +1,400 @@
 """SQLite persistence: posts, history (dedup), runs."""
 
-import json
 import sqlite3
-from datetime import datetime
-from pathlib import Path
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from datetime import datetime, timedelta
 
-DB_PATH = Path(__file__).parent.parent / "data" / "pain_miner.db"
+from . import fastjson
+from .db_pool import reader, transaction, writer
 
+# Only the opening of a post is ever sent for analysis, so bodies are stored capped
+ANALYSIS_BODY_LIMIT = 2000
 
-def _conn():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+_POST_COLS = """id, platform, url, title, body, author, community, points, num_comments,
+                created_at, fetched_at, topic, pain_score, demand_score, relevance_score,
+                matched_queries, analyzed, analysis_result"""
+
+
+class RowDict(Mapping):
+    """Read-only dict view over a sqlite3.Row — no per-row dict is built.
+
+    Supports p["col"], p.get("col"), `in`, iteration and dict(p).
+    """
+
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getitem__(self, key):
+        try:
+            return self._row[key]
+        except IndexError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self._row.keys())
+
+    def __len__(self):
+        return len(self._row)
+
+    def __repr__(self):
+        return f"RowDict({dict(self)!r})"
 
 
 def init_db():
-    conn = _conn()
+    with writer() as conn:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS posts (
+                id TEXT PRIMARY KEY,
+                platform TEXT,
+                url TEXT,
+                title TEXT,
+                body TEXT,
+                author TEXT,
+                community TEXT,
+                points INTEGER DEFAULT 0,
+                num_comments INTEGER DEFAULT 0,
+                created_at TEXT,
+                fetched_at TEXT,
+                topic TEXT,
+                pain_score REAL DEFAULT 0,
+                demand_score REAL DEFAULT 0,
+                relevance_score REAL DEFAULT 0,
+                matched_queries TEXT DEFAULT '[]',
+                analyzed INTEGER DEFAULT 0,
+                analysis_result TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS history (
+                id TEXT,
+                platform TEXT,
+                processed_at TEXT,
+                PRIMARY KEY (id, platform)
+            );
+
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT,
+                platforms TEXT,
+                started_at TEXT,
+                completed_at TEXT,
+                posts_fetched INTEGER DEFAULT 0,
+                posts_analyzed INTEGER DEFAULT 0,
+                report_path TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT,
+                model TEXT,
+                embedding BLOB,
+                urls TEXT DEFAULT '[]',
+                pain_points TEXT,
+                created_at TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS prompt_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT,
+                created_at TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS comment_cache (
+                key TEXT PRIMARY KEY,
+                comments TEXT,
+                created_at TEXT
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_posts_topic ON posts(topic);
+            CREATE INDEX IF NOT EXISTS idx_posts_relevance ON posts(relevance_score);
+            CREATE INDEX IF NOT EXISTS idx_posts_platform ON posts(platform);
+            CREATE INDEX IF NOT EXISTS idx_posts_topic_analyzed_rel
+                ON posts(topic, analyzed, relevance_score DESC);
+            CREATE INDEX IF NOT EXISTS idx_analysis_cache_topic ON analysis_cache(topic, model);
+        """)
+        conn.commit()
+        _migrate(conn)
+        _init_fts(conn)
+
+
+def _migrate(conn):
+    """Add columns introduced after a database was first created."""
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(analysis_cache)")}
+    if "urls" not in cols:
+        # Older entries have no URLs, so they never pass the overlap check
+        conn.execute("ALTER TABLE analysis_cache ADD COLUMN urls TEXT DEFAULT '[]'")
+        conn.commit()
+
+
+def _init_fts(conn):
+    """Full-text index over posts title/body, kept in sync by triggers.
+
+    External-content FTS5 table (no second copy of the text); porter stemming
+    so "crash" also matches "crashes". Backfilled once when first created.
+    Skipped on SQLite builds without FTS5.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='posts_fts'"
+    ).fetchone()
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                title, body, content='posts', content_rowid='rowid', tokenize='porter'
+            )
+        """)
+    except sqlite3.OperationalError:  # No FTS5 module in this SQLite build
+        return
     conn.executescript("""
-        CREATE TABLE IF NOT EXISTS posts (
-            id TEXT PRIMARY KEY,
-            platform TEXT,
-            url TEXT,
-            title TEXT,
-            body TEXT,
-            author TEXT,
-            community TEXT,
-            points INTEGER DEFAULT 0,
-            num_comments INTEGER DEFAULT 0,
-            created_at TEXT,
-            fetched_at TEXT,
-            topic TEXT,
-            pain_score REAL DEFAULT 0,
-            demand_score REAL DEFAULT 0,
-            relevance_score REAL DEFAULT 0,
-            matched_queries TEXT DEFAULT '[]',
-            analyzed INTEGER DEFAULT 0,
-            analysis_result TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS history (
-            id TEXT,
-            platform TEXT,
-            processed_at TEXT,
-            PRIMARY KEY (id, platform)
-        );
-
-        CREATE TABLE IF NOT EXISTS runs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            topic TEXT,
-            platforms TEXT,
-            started_at TEXT,
-            completed_at TEXT,
-            posts_fetched INTEGER DEFAULT 0,
-            posts_analyzed INTEGER DEFAULT 0,
-            report_path TEXT
-        );
-
-        CREATE INDEX IF NOT EXISTS idx_posts_topic ON posts(topic);
-        CREATE INDEX IF NOT EXISTS idx_posts_relevance ON posts(relevance_score);
-        CREATE INDEX IF NOT EXISTS idx_posts_platform ON posts(platform);
+        CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+        END;
+        CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts(posts_fts, rowid, title, body)
+            VALUES ('delete', old.rowid, old.title, old.body);
+        END;
+        CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, body ON posts BEGIN
+            INSERT INTO posts_fts(posts_fts, rowid, title, body)
+            VALUES ('delete', old.rowid, old.title, old.body);
+            INSERT INTO posts_fts(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+        END;
     """)
+    if not exists:
+        conn.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
     conn.commit()
-    conn.close()
 
 
 def is_processed(post_id, platform):
-    conn = _conn()
-    row = conn.execute(
-        "SELECT 1 FROM history WHERE id=? AND platform=?",
-        (post_id, platform)
-    ).fetchone()
-    conn.close()
-    return row is not None
+    with reader() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM history WHERE id=? AND platform=?",
+            (post_id, platform)
+        ).fetchone()
+        return row is not None
+
+
+def _queries_json(matched_queries):
+    return fastjson.dumps(matched_queries)
+
+
+def _truncate_for_analysis(body, limit=ANALYSIS_BODY_LIMIT):
+    return body[:limit] if body else ""
 
 
 def insert_posts(posts):
-    """Insert list of post dicts. Skip duplicates via INSERT OR IGNORE."""
+    """Insert list of post dicts. Skip duplicates via INSERT OR IGNORE.
+
+    Bodies are capped at ANALYSIS_BODY_LIMIT chars, in place, so the dicts
+    handed on to the analyzer match what is stored.
+    """
     if not posts:
         return 0
-    conn = _conn()
-    inserted = 0
+    now = datetime.utcnow().isoformat()
+    rows = []
     for p in posts:
-        try:
-            conn.execute("""
-                INSERT OR IGNORE INTO posts
-                (id, platform, url, title, body, author, community,
-                 points, num_comments, created_at, fetched_at, topic,
-                 pain_score, demand_score, relevance_score, matched_queries)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                p["id"], p["platform"], p["url"], p.get("title", ""),
-                p.get("body", ""), p.get("author", ""), p.get("community", ""),
-                p.get("points", 0), p.get("num_comments", 0),
-                p.get("created_at", ""), datetime.utcnow().isoformat(),
-                p.get("topic", ""), p.get("pain_score", 0),
-                p.get("demand_score", 0), p.get("relevance_score", 0),
-                json.dumps(p.get("matched_queries", []))
-            ))
-            inserted += conn.total_changes  # approximate
-        except sqlite3.IntegrityError:
-            pass
-    conn.commit()
-    conn.close()
+        p["body"] = _truncate_for_analysis(p.get("body", ""))
+        rows.append((
+            p["id"], p["platform"], p["url"], p.get("title", ""),
+            p["body"], p.get("author", ""), p.get("community", ""),
+            p.get("points", 0), p.get("num_comments", 0),
+            p.get("created_at", ""), now,
+            p.get("topic", ""), p.get("pain_score", 0),
+            p.get("demand_score", 0), p.get("relevance_score", 0),
+            p.get("_mq_json") or _queries_json(p.get("matched_queries", []))
+        ))
+
+    with transaction() as conn:  # One transaction (and one commit) for the whole batch
+        cur = conn.executemany("""
+            INSERT OR IGNORE INTO posts
+            (id, platform, url, title, body, author, community,
+             points, num_comments, created_at, fetched_at, topic,
+             pain_score, demand_score, relevance_score, matched_queries)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        inserted = cur.rowcount
     return inserted
 
 
 def update_scores(post_id, pain_score, demand_score, relevance_score, matched_queries):
-    conn = _conn()
-    conn.execute("""
-        UPDATE posts SET pain_score=?, demand_score=?, relevance_score=?,
-                         matched_queries=?
-        WHERE id=?
-    """, (pain_score, demand_score, relevance_score,
-          json.dumps(matched_queries), post_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE posts SET pain_score=?, demand_score=?, relevance_score=?,
+                             matched_queries=?
+            WHERE id=?
+        """, (pain_score, demand_score, relevance_score,
+              _queries_json(matched_queries), post_id))
 
 
 def mark_history(post_ids, platform):
-    conn = _conn()
     now = datetime.utcnow().isoformat()
-    conn.executemany(
-        "INSERT OR IGNORE INTO history (id, platform, processed_at) VALUES (?, ?, ?)",
-        [(pid, platform, now) for pid in post_ids]
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO history (id, platform, processed_at) VALUES (?, ?, ?)",
+            [(pid, platform, now) for pid in post_ids]
+        )
 
 
 def get_top_posts(topic, limit=50, min_score=0):
     """Get top-scored posts for a topic, not yet analyzed."""
-    conn = _conn()
-    rows = conn.execute("""
-        SELECT * FROM posts
-        WHERE topic=? AND analyzed=0 AND relevance_score >= ?
-        ORDER BY relevance_score DESC
-        LIMIT ?
-    """, (topic, min_score, limit)).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    with reader() as conn:
+        rows = conn.execute("""
+            SELECT id, platform, url, title, SUBSTR(body, 1, ?) AS body, author,
+                   community, points, num_comments, created_at, fetched_at, topic,
+                   pain_score, demand_score, relevance_score, matched_queries,
+                   analyzed, analysis_result
+            FROM posts
+            WHERE topic=? AND analyzed=0 AND relevance_score >= ?
+            ORDER BY relevance_score DESC
+            LIMIT ?
+        """, (ANALYSIS_BODY_LIMIT, topic, min_score, limit)).fetchall()
+        return [RowDict(r) for r in rows]
 
 
 def get_all_posts(topic):
-    conn = _conn()
-    rows = conn.execute("""
-        SELECT * FROM posts WHERE topic=?
-        ORDER BY relevance_score DESC
-    """, (topic,)).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    with reader() as conn:
+        rows = conn.execute(f"""
+            SELECT {_POST_COLS} FROM posts WHERE topic=?
+            ORDER BY relevance_score DESC
+        """, (topic,)).fetchall()
+        return [RowDict(r) for r in rows]
+
+
+def posts_for_query(query, topic=None):
+    """Posts whose matched_queries contain `query`, most relevant first.
+
+    Filtered in SQLite with json_each, so no JSON is decoded in Python.
+    """
+    sql = f"""
+        SELECT {_POST_COLS} FROM posts
+        WHERE EXISTS (SELECT 1 FROM json_each(posts.matched_queries) WHERE value=?)
+    """
+    params = [query]
+    if topic is not None:
+        sql += " AND topic=?"
+        params.append(topic)
+    sql += " ORDER BY relevance_score DESC"
+    with reader() as conn:
+        return [RowDict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def fts_match_counts(words, topic=None):
+    """Count, per post id, how many of `words` appear in its title/body.
+
+    Matching is done by SQLite's FTS5 index (token-based, porter-stemmed),
+    one query per word; posts matching none of the words are omitted.
+    Requires an SQLite build with FTS5 (see _init_fts).
+    """
+    sql = """
+        SELECT p.id FROM posts_fts JOIN posts p ON p.rowid = posts_fts.rowid
+        WHERE posts_fts MATCH ?
+    """
+    if topic is not None:
+        sql += " AND p.topic=?"
+    counts = Counter()
+    with reader() as conn:
+        for w in words:
+            params = (_fts_phrase(w), topic) if topic is not None else (_fts_phrase(w),)
+            counts.update(r[0] for r in conn.execute(sql, params))
+    return dict(counts)
 
 
 def mark_analyzed(post_ids, analysis_results):
     """Mark posts as analyzed, store Gemini results."""
-    conn = _conn()
-    for pid, result in zip(post_ids, analysis_results):
-        conn.execute("""
-            UPDATE posts SET analyzed=1, analysis_result=? WHERE id=?
-        """, (json.dumps(result, ensure_ascii=False) if result else None, pid))
-    conn.commit()
-    conn.close()
+    params = [(fastjson.dumps(result) if result else None, pid)
+              for pid, result in zip(post_ids, analysis_results)]
+    with transaction() as conn:
+        conn.executemany(
+            "UPDATE posts SET analyzed=1, analysis_result=? WHERE id=?", params
+        )
 
 
 def save_run(topic, platforms, posts_fetched, posts_analyzed, report_path):
-    conn = _conn()
     now = datetime.utcnow().isoformat()
-    conn.execute("""
-        INSERT INTO runs (topic, platforms, started_at, completed_at,
-                          posts_fetched, posts_analyzed, report_path)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (topic, platforms, now, now, posts_fetched, posts_analyzed, report_path))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO runs (topic, platforms, started_at, completed_at,
+                              posts_fetched, posts_analyzed, report_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (topic, platforms, now, now, posts_fetched, posts_analyzed, report_path))
 
 
 def get_latest_run(topic=None):
-    conn = _conn()
-    if topic:
+    with reader() as conn:
+        if topic:
+            row = conn.execute(
+                "SELECT * FROM runs WHERE topic=? ORDER BY id DESC LIMIT 1",
+                (topic,)
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT * FROM runs ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return dict(row) if row else None
+
+
+def get_analysis_cache(topic, model):
+    """Return (embedding, urls, pain_points) tuples cached for a topic and model."""
+    with reader() as conn:
+        rows = conn.execute(
+            "SELECT embedding, urls, pain_points FROM analysis_cache WHERE topic=? AND model=?",
+            (topic, model)
+        ).fetchall()
+        return [(array("f", r["embedding"]), fastjson.loads(r["urls"] or "[]"),
+                 fastjson.loads(r["pain_points"])) for r in rows]
+
+
+def save_analysis_cache(topic, model, embedding, urls, pain_points):
+    """Store a batch's pain points keyed by its embedding (float32 BLOB) and post URLs."""
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO analysis_cache (topic, model, embedding, urls, pain_points, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (topic, model, array("f", embedding).tobytes(), fastjson.dumps(urls),
+              fastjson.dumps(pain_points), datetime.utcnow().isoformat()))
+
+
+def get_cached_response(key):
+    """Return the raw Gemini response stored for a prompt hash, or None."""
+    with reader() as conn:
         row = conn.execute(
-            "SELECT * FROM runs WHERE topic=? ORDER BY id DESC LIMIT 1",
-            (topic,)
+            "SELECT response FROM prompt_cache WHERE key=?", (key,)
         ).fetchone()
-    else:
+        return row["response"] if row else None
+
+
+def save_cached_response(key, response):
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO prompt_cache (key, response, created_at) VALUES (?, ?, ?)",
+            (key, response, datetime.utcnow().isoformat())
+        )
+
+
+def get_cached_comments(key, max_age_hours=24):
+    """Return (comments, fetched_at) cached under key if newer than max_age_hours, else None.
+
+    fetched_at is the naive UTC datetime the comments were stored.
+    """
+    cutoff = (datetime.utcnow() - timedelta(hours=max_age_hours)).isoformat()
+    with reader() as conn:
         row = conn.execute(
-            "SELECT * FROM runs ORDER BY id DESC LIMIT 1"
+            "SELECT comments, created_at FROM comment_cache WHERE key=? AND created_at >= ?",
+            (key, cutoff)
         ).fetchone()
-    conn.close()
-    return dict(row) if row else None
+        if row is None:
+            return None
+        return fastjson.loads(row["comments"]), datetime.fromisoformat(row["created_at"])
+
+
+def save_cached_comments(key, comments):
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO comment_cache (key, comments, created_at) VALUES (?, ?, ?)",
+            (key, fastjson.dumps(comments), datetime.utcnow().isoformat())
+        )
@@ -0,0 +1,120 @@
+"""SQLite connection pool: one shared writer, a queue of read-only readers."""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent.parent / "data" / "pain_miner.db"
+MAX_READERS = 4
+
+# WAL lets readers run alongside the single writer; synchronous=NORMAL avoids
+# an fsync per commit, and the larger page cache / mmap saves read syscalls
+_WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+_READER_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+_init_lock = threading.Lock()
+_write_lock = threading.Lock()
+_pool = None  # (path, writer connection, reader queue, reader count)
+
+
+def _connect(target, pragmas, **kwargs):
+    conn = sqlite3.connect(target, check_same_thread=False, **kwargs)
+    conn.row_factory = sqlite3.Row
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+
+def set_db_path(path):
+    """Point the pool at another database file; the next borrow reopens it."""
+    global DB_PATH
+    DB_PATH = Path(path)
+
+
+def _get_pool():
+    """Return the pool for the current DB_PATH, (re)creating it if needed."""
+    global _pool
+    with _init_lock:
+        if _pool is None or _pool["path"] != DB_PATH:
+            if _pool is not None:
+                _close(_pool)
+            DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+            # The writer opens first so the file (and its WAL) exists for readers
+            _pool = {
+                "path": DB_PATH,
+                "writer": _connect(str(DB_PATH), _WRITER_PRAGMAS),
+                "readers": queue.Queue(),
+                "opened": 0,
+            }
+        return _pool
+
+
+def _close(pool):
+    pool["writer"].close()
+    while True:
+        try:
+            pool["readers"].get_nowait().close()
+        except queue.Empty:
+            break
+
+
+@contextmanager
+def writer():
+    """Yield the single writer connection; writes are serialised by a lock."""
+    pool = _get_pool()
+    with _write_lock:
+        yield pool["writer"]
+
+
+@contextmanager
+def transaction():
+    """Yield the writer inside BEGIN IMMEDIATE; commit on success, roll back on error.
+
+    Taking the write lock up front means the transaction never has to upgrade
+    a read lock later, which is where SQLITE_BUSY would otherwise come from.
+    """
+    with writer() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+@contextmanager
+def reader():
+    """Borrow a read-only connection (up to MAX_READERS are opened)."""
+    pool = _get_pool()
+    try:
+        conn = pool["readers"].get_nowait()
+    except queue.Empty:
+        with _init_lock:
+            can_open = pool["opened"] < MAX_READERS
+            if can_open:
+                pool["opened"] += 1
+        if can_open:
+            uri = f"{pool['path'].resolve().as_uri()}?mode=ro"
+            conn = _connect(uri, _READER_PRAGMAS, uri=True)
+        else:
+            conn = pool["readers"].get()
+    try:
+        yield conn
+    finally:
+        pool["readers"].put(conn)
@@ -0,0 +1,31 @@
+"""JSON (de)serialization via orjson when installed, stdlib json otherwise."""
+
+import json
+
+try:
+    import orjson  # Optional: SIMD parsing, writes UTF-8 bytes directly
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """Serialize to a compact JSON str, keeping non-ASCII characters as-is."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def dumpb(obj):
+    """Serialize to compact UTF-8 JSON bytes (e.g. an HTTP request body)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from str or bytes.
+
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+    catch either.
+    """
+    return orjson.loads(data) if orjson is not None else json.loads(data)
@@ -1,6 +1,8 @@
 """Generate Markdown reports from analysis results."""
 
+import heapq
 import json
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
@@ -15,12 +17,23 @@ def generate_report(topic, posts, pain_points, run_meta, cfg):
     filename = f"{date_str}-{slug}.md"
     filepath = out_dir / filename
 
+    # One pass: platform counts, analyzed count and discussion-hub candidates
+    platform_counts = Counter()
+    analyzed = 0
+    stories = []  # high-engagement posts, filtered by topic relevance
+    for p in posts:
+        platform_counts[p.get("platform")] += 1
+        if p.get("analyzed"):
+            analyzed += 1
+        if p.get("num_comments", 0) > 10 and p.get("topic_relevance", 1.0) >= 0.4:
+            stories.append(p)
+
     total_posts = len(posts)
-    analyzed_posts = run_meta.get("analyzed_count", sum(1 for p in posts if p.get("analyzed")))
-    hn_posts = sum(1 for p in posts if p.get("platform") == "hn")
-    reddit_posts = sum(1 for p in posts if p.get("platform") == "reddit")
-    ph_posts = sum(1 for p in posts if p.get("platform") == "producthunt")
-    x_posts = sum(1 for p in posts if p.get("platform") == "twitter")
+    analyzed_posts = run_meta.get("analyzed_count", analyzed)
+    hn_posts = platform_counts["hn"]
+    reddit_posts = platform_counts["reddit"]
+    ph_posts = platform_counts["producthunt"]
+    x_posts = platform_counts["twitter"]
 
     lines = []
     lines.append(f"# Pain Point Research: {topic}")
@@ -46,14 +59,18 @@ def generate_report(topic, posts, pain_points, run_meta, cfg):
     lines.append("")
 
     if not pain_points:
-        lines.append("## Results\n")
-        lines.append("No pain points identified by Gemini analysis.\n")
-        lines.append("### Top Scored Posts (Rule-Based)\n")
+        lines.extend((
+            "## Results\n",
+            "No pain points identified by Gemini analysis.\n",
+            "### Top Scored Posts (Rule-Based)\n",
+        ))
         for i, p in enumerate(posts[:20], 1):
-            lines.append(f"**{i}. [{p.get('title', 'Untitled')[:80]}]({p.get('url', '')})**")
-            lines.append(f"- Platform: {p.get('platform')} | Points: {p.get('points', 0)} | "
-                        f"Pain: {p.get('pain_score', 0)} | Demand: {p.get('demand_score', 0)} | "
-                        f"Score: {p.get('relevance_score', 0)}")
+            lines.extend((
+                f"**{i}. [{p.get('title', 'Untitled')[:80]}]({p.get('url', '')})**",
+                f"- Platform: {p.get('platform')} | Points: {p.get('points', 0)} | "
+                f"Pain: {p.get('pain_score', 0)} | Demand: {p.get('demand_score', 0)} | "
+                f"Score: {p.get('relevance_score', 0)}",
+            ))
             body_preview = p.get("body", "")[:200].replace("\n", " ")
             if body_preview:
                 lines.append(f"- > {body_preview}...")
@@ -62,9 +79,14 @@ def generate_report(topic, posts, pain_points, run_meta, cfg):
         # High confidence pain points
         high = [pp for pp in pain_points
                 if pp.get("unique_users", 0) >= 3 or pp.get("emotional_intensity", 0) >= 4]
+        # Bucket by identity: `pp not in list` made this quadratic
+        high_ids = {id(pp) for pp in high}
         medium = [pp for pp in pain_points
-                  if pp not in high and (pp.get("unique_users", 0) >= 2 or pp.get("payment_signal"))]
-        low = [pp for pp in pain_points if pp not in high and pp not in medium]
+                  if id(pp) not in high_ids
+                  and (pp.get("unique_users", 0) >= 2 or pp.get("payment_signal"))]
+        medium_ids = {id(pp) for pp in medium}
+        low = [pp for pp in pain_points
+               if id(pp) not in high_ids and id(pp) not in medium_ids]
 
         if high:
             lines.append("## High Confidence Pain Points\n")
@@ -81,17 +103,18 @@ def generate_report(topic, posts, pain_points, run_meta, cfg):
             for i, pp in enumerate(low, 1):
                 _format_pain_point(lines, i, pp)
 
-    # Top stories / high-engagement posts (filtered by topic relevance)
-    stories = [p for p in posts
-               if p.get("num_comments", 0) > 10 and p.get("topic_relevance", 1.0) >= 0.4]
-    stories.sort(key=lambda x: x.get("points", 0), reverse=True)
-    if stories[:10]:
-        lines.append("## High-Engagement Discussion Hubs\n")
-        lines.append("These posts have the most discussion — worth reading manually:\n")
-        for s in stories[:10]:
-            lines.append(f"- [{s.get('title', 'Untitled')[:80]}]({s.get('url', '')}) "
-                        f"— {s.get('points', 0)}↑ {s.get('num_comments', 0)}💬 "
-                        f"({s.get('platform')})")
+    # Top stories / high-engagement posts
+    stories = heapq.nlargest(10, stories, key=lambda x: x.get("points", 0))
+    if stories:
+        lines.extend((
+            "## High-Engagement Discussion Hubs\n",
+            "These posts have the most discussion — worth reading manually:\n",
+        ))
+        lines.extend(
+            f"- [{s.get('title', 'Untitled')[:80]}]({s.get('url', '')}) "
+            f"— {s.get('points', 0)}↑ {s.get('num_comments', 0)}💬 ({s.get('platform')})"
+            for s in stories
+        )
         lines.append("")
 
     content = "\n".join(lines)
@@ -100,11 +123,13 @@ def generate_report(topic, posts, pain_points, run_meta, cfg):
 
 
 def _format_pain_point(lines, index, pp):
-    lines.append(f"### {index}. {pp.get('description', 'Unknown')}\n")
-    lines.append(f"- **Category**: {pp.get('category', 'unknown')}")
-    lines.append(f"- **Emotional intensity**: {pp.get('emotional_intensity', '?')}/5")
-    lines.append(f"- **Unique users**: {pp.get('unique_users', '?')}")
-    lines.append(f"- **Payment signal**: {'Yes' if pp.get('payment_signal') else 'No'}")
+    lines.extend((
+        f"### {index}. {pp.get('description', 'Unknown')}\n",
+        f"- **Category**: {pp.get('category', 'unknown')}",
+        f"- **Emotional intensity**: {pp.get('emotional_intensity', '?')}/5",
+        f"- **Unique users**: {pp.get('unique_users', '?')}",
+        f"- **Payment signal**: {'Yes' if pp.get('payment_signal') else 'No'}",
+    ))
 
     # Cross-platform signal
     signal = pp.get("cross_platform_signal", "single")
@@ -114,19 +139,18 @@ def _format_pain_point(lines, index, pp):
     elif signal == "moderate":
         lines.append(f"- **Cross-platform**: ⚡ Moderate ({', '.join(platforms)})")
 
-    if pp.get("payment_quote"):
-        lines.append(f'  - > "{pp["payment_quote"]}"')
-    if pp.get("current_workaround"):
-        lines.append(f"- **Current workaround**: {pp['current_workaround']}")
+    payment_quote = pp.get("payment_quote")
+    if payment_quote:
+        lines.append(f'  - > "{payment_quote}"')
+    workaround = pp.get("current_workaround")
+    if workaround:
+        lines.append(f"- **Current workaround**: {workaround}")
 
     quotes = pp.get("representative_quotes", [])
     if quotes:
         lines.append("- **Quotes**:")
-        for q in quotes[:3]:
-            if isinstance(q, dict):
-                lines.append(f'  - > "{q.get("text", q)}"')
-            else:
-                lines.append(f'  - > "{q}"')
+        lines.extend(f'  - > "{q.get("text", q) if isinstance(q, dict) else q}"'
+                     for q in quotes[:3])
 
     urls = pp.get("source_urls", [])
     if urls:
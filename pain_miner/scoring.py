@@ -1,8 +1,11 @@
 """Rule-based scoring — no LLM cost, fast."""
 
+import heapq
 import math
 import re
 
+from . import fastjson
+
 
 PAIN_WORDS = [
     "frustrat", "hate", "wish", "terrible", "awful", "slow", "expensive",
@@ -20,6 +23,36 @@ DEMAND_WORDS = [
 ]
 
 
+def _compile_matcher(words):
+    """Build a single-pass matcher for "how many of these words occur in text".
+
+    The lookahead alternation reports the longest word starting at every
+    position in one C-level scan; `contains` maps each word to all listed
+    words inside it, so shorter overlapping words are still counted.
+    """
+    words = sorted(set(words), key=len, reverse=True)
+    if not words:
+        return None
+    regex = re.compile("(?=(" + "|".join(re.escape(w) for w in words) + "))")
+    contains = {w: frozenset(v for v in words if v in w) for w in words}
+    return regex, contains
+
+
+def _count_matches(matcher, text):
+    """Number of distinct matcher words that are substrings of text."""
+    if matcher is None:
+        return 0
+    regex, contains = matcher
+    found = set()
+    for word in set(regex.findall(text)):
+        found |= contains[word]
+    return len(found)
+
+
+_PAIN_MATCHER = _compile_matcher(PAIN_WORDS)
+_DEMAND_MATCHER = _compile_matcher(DEMAND_WORDS)
+
+
 def _extract_topic_keywords(topic):
     """Extract core keywords AND phrases from the topic for relevance matching.
 
@@ -48,7 +81,12 @@ def _extract_topic_keywords(topic):
         else:
             stems.add(w + "s")  # Also match plural form
 
-    return {"words": words, "stems": stems, "phrases": phrases}
+    return {
+        "words": words, "stems": stems, "phrases": phrases,
+        # Compiled once per topic, reused for every post
+        "phrase_matcher": _compile_matcher(phrases),
+        "stem_matcher": _compile_matcher(stems),
+    }
 
 
 def _topic_relevance(text, topic_info):
@@ -61,17 +99,14 @@ def _topic_relevance(text, topic_info):
     if not topic_info:
         return 1.0
 
-    phrases = topic_info["phrases"]
-    stems = topic_info["stems"]
-
     # Check phrase matches first (strong signal)
-    phrase_matches = sum(1 for p in phrases if p in text)
+    phrase_matches = _count_matches(topic_info["phrase_matcher"], text)
     if phrase_matches >= 1:
         # At least one bigram matched — likely on-topic
         return min(1.0, 0.6 + 0.2 * phrase_matches)
 
     # No phrase matches — check individual word matches (weak signal)
-    word_matches = sum(1 for s in stems if s in text)
+    word_matches = _count_matches(topic_info["stem_matcher"], text)
     total_words = len(topic_info["words"])
 
     if word_matches == 0:
@@ -89,13 +124,15 @@ def score_post(post, cfg, topic_info=None):
     """Compute pain_score, demand_score, relevance_score for a post."""
     weights = cfg["scoring"]
 
-    text = (post.get("title", "") + " " + post.get("body", "")).lower()
+    text = post.get("_lc")
+    if text is None:
+        text = (post.get("title", "") + " " + post.get("body", "")).lower()
     points = post.get("points", 0)
     n_queries = len(post.get("matched_queries", []))
 
     # Count signal words
-    pain_count = sum(1 for w in PAIN_WORDS if w in text)
-    demand_count = sum(1 for w in DEMAND_WORDS if w in text)
+    pain_count = _count_matches(_PAIN_MATCHER, text)
+    demand_count = _count_matches(_DEMAND_MATCHER, text)
 
     # Normalize engagement: log scale, cap at 5
     engagement = min(math.log1p(points), 5) if points > 0 else 0
@@ -125,12 +162,22 @@ def score_post(post, cfg, topic_info=None):
     }
 
 
-def score_posts(posts, cfg, topic=""):
-    """Score all posts, return them sorted by relevance."""
+def score_posts(posts, cfg, topic="", top_k=None):
+    """Score all posts, return them sorted by relevance.
+
+    With top_k, only the top_k most relevant posts are returned (heap
+    selection instead of a full sort).
+    """
     topic_info = _extract_topic_keywords(topic) if topic else None
     for p in posts:
+        # Lowercased once; every matcher (and any re-score) reads the same buffer
+        p["_lc"] = (p.get("title", "") + " " + p.get("body", "")).lower()
         scores = score_post(p, cfg, topic_info=topic_info)
         p.update(scores)
+        # Encoded once here; db.insert_posts stores it as-is
+        p["_mq_json"] = fastjson.dumps(p.get("matched_queries", []))
 
+    if top_k:
+        return heapq.nlargest(top_k, posts, key=lambda x: x["relevance_score"])
     posts.sort(key=lambda x: x["relevance_score"], reverse=True)
     return posts
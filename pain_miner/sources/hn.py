@@ -1,11 +1,13 @@
 """HN Algolia API source — free, no auth required."""
 
-import json
 import html as html_lib
 import re
 import time
-import urllib.request
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import fastjson
+from . import http_pool
 
 
 # Signal word templates — {topic} gets replaced
@@ -43,13 +45,30 @@ def _fetch(query, tags="comment", hits=30, points_min=0, timeout=10):
 
     url = f"https://hn.algolia.com/api/v1/search?{params}"
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "pain-miner/1.0"})
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read())
+        return fastjson.loads(http_pool.request(url, timeout=timeout))
     except Exception as e:
         return {"hits": [], "nbHits": 0, "error": str(e)}
 
 
+def _fetch_all(queries, cfg, **fetch_kwargs):
+    """Run queries concurrently; yield (query, response) pairs in query order.
+
+    Requests are I/O bound, so a small thread pool hides the round trips.
+    Each worker still pauses query_delay_seconds after a request to stay
+    polite to Algolia. Results are merged by the caller's thread.
+    """
+    delay = cfg["search"].get("query_delay_seconds", 0.3)
+    workers = max(1, cfg["search"].get("parallel_queries", 4))
+
+    def run(q):
+        data = _fetch(q, **fetch_kwargs)
+        time.sleep(delay)
+        return data
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        yield from zip(queries, ex.map(run, queries))
+
+
 def _clean_html(text):
     if not text:
         return ""
@@ -59,17 +78,51 @@ def _clean_html(text):
     return text.strip()
 
 
+def _build_comment(h, topic):
+    oid = h["objectID"]
+    return {
+        "id": f"hn_{oid}",
+        "platform": "hn",
+        "url": f"https://news.ycombinator.com/item?id={oid}",
+        "title": h.get("story_title", ""),
+        "body": _clean_html(h.get("comment_text", "")),
+        "author": h.get("author", ""),
+        "community": "hn",
+        "points": h.get("points") or 0,
+        "num_comments": 0,
+        "created_at": h.get("created_at", ""),
+        "topic": topic,
+        "matched_queries": [],
+    }
+
+
+def _build_story(h, topic):
+    oid = h["objectID"]
+    return {
+        "id": f"hn_{oid}",
+        "platform": "hn",
+        "url": f"https://news.ycombinator.com/item?id={oid}",
+        "title": h.get("title", ""),
+        "body": "",
+        "author": h.get("author", ""),
+        "community": "hn",
+        "points": h.get("points") or 0,
+        "num_comments": h.get("num_comments") or 0,
+        "created_at": h.get("created_at", ""),
+        "topic": topic,
+        "matched_queries": [],
+    }
+
+
 def fetch_comments(topic, cfg):
     """Fetch HN comments matching topic with pain/demand signal queries."""
     hn_cfg = cfg["platforms"]["hn"]
-    delay = cfg["search"].get("query_delay_seconds", 0.3)
     hits_per = hn_cfg.get("hits_per_query", 30)
 
     queries = [t.format(topic=topic) for t in COMMENT_QUERY_TEMPLATES]
     all_posts = {}
 
-    for q in queries:
-        data = _fetch(q, tags="comment", hits=hits_per)
+    for q, data in _fetch_all(queries, cfg, tags="comment", hits=hits_per):
         if data.get("error"):
             print(f"  [HN] ✗ '{q}' → {data['error']}")
             continue
@@ -79,25 +132,10 @@ def fetch_comments(topic, cfg):
         print(f"  [HN] ✓ '{q}' → {total} total, fetched {fetched}")
 
         for h in data["hits"]:
-            oid = h["objectID"]
-            if oid not in all_posts:
-                all_posts[oid] = {
-                    "id": f"hn_{oid}",
-                    "platform": "hn",
-                    "url": f"https://news.ycombinator.com/item?id={oid}",
-                    "title": h.get("story_title", ""),
-                    "body": _clean_html(h.get("comment_text", "")),
-                    "author": h.get("author", ""),
-                    "community": "hn",
-                    "points": h.get("points") or 0,
-                    "num_comments": 0,
-                    "created_at": h.get("created_at", ""),
-                    "topic": topic,
-                    "matched_queries": [],
-                }
-            all_posts[oid]["matched_queries"].append(q)
-
-        time.sleep(delay)
+            post = all_posts.get(h["objectID"])
+            if post is None:
+                post = all_posts[h["objectID"]] = _build_comment(h, topic)
+            post["matched_queries"].append(q)
 
     return list(all_posts.values())
 
@@ -105,15 +143,13 @@ def fetch_comments(topic, cfg):
 def fetch_stories(topic, cfg):
     """Fetch HN stories (top-level posts) for topic."""
     hn_cfg = cfg["platforms"]["hn"]
-    delay = cfg["search"].get("query_delay_seconds", 0.3)
     hits_per = hn_cfg.get("hits_per_query", 30)
     min_pts = hn_cfg.get("min_points", 2)
 
     queries = [t.format(topic=topic) for t in STORY_QUERY_TEMPLATES]
     all_stories = {}
 
-    for q in queries:
-        data = _fetch(q, tags="story", hits=hits_per, points_min=min_pts)
+    for q, data in _fetch_all(queries, cfg, tags="story", hits=hits_per, points_min=min_pts):
         if data.get("error"):
             print(f"  [HN stories] ✗ '{q}' → {data['error']}")
             continue
@@ -122,24 +158,9 @@ def fetch_stories(topic, cfg):
         print(f"  [HN stories] ✓ '{q}' → {data.get('nbHits', 0)} total, fetched {fetched}")
 
         for h in data["hits"]:
-            oid = h["objectID"]
-            if oid not in all_stories:
-                all_stories[oid] = {
-                    "id": f"hn_{oid}",
-                    "platform": "hn",
-                    "url": f"https://news.ycombinator.com/item?id={oid}",
-                    "title": h.get("title", ""),
-                    "body": "",
-                    "author": h.get("author", ""),
-                    "community": "hn",
-                    "points": h.get("points") or 0,
-                    "num_comments": h.get("num_comments") or 0,
-                    "created_at": h.get("created_at", ""),
-                    "topic": topic,
-                    "matched_queries": [],
-                }
-            all_stories[oid]["matched_queries"].append(q)
-
-        time.sleep(delay)
+            story = all_stories.get(h["objectID"])
+            if story is None:
+                story = all_stories[h["objectID"]] = _build_story(h, topic)
+            story["matched_queries"].append(q)
 
     return list(all_stories.values())
@@ -0,0 +1,173 @@
+"""Keep-alive HTTP for the sources — one reusable connection per host and thread."""
+
+import base64
+import email.utils
+import gzip
+import http.client
+import io
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+
+USER_AGENT = "pain-miner/1.0"
+MAX_REDIRECTS = 5
+MAX_RETRY_WAIT = 60
+
+# A reused socket the server already closed fails on first use — reconnect once
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+_local = threading.local()
+
+
+def _decode_body(resp, body):
+    """Undo gzip/deflate Content-Encoding (JSON APIs compress ~5-10x)."""
+    encoding = (resp.getheader("Content-Encoding") or "").lower()
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:  # Some servers send raw deflate without the zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+def _proxy_for(scheme, host):
+    """(proxy host:port, Proxy-Authorization headers) from the *_proxy env vars, or None.
+
+    Mirrors urllib.request.urlopen: no_proxy / proxy_bypass are honoured.
+    """
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    if "://" not in proxy:
+        proxy = "http://" + proxy
+    parts = urllib.parse.urlsplit(proxy)
+    auth = {}
+    if parts.username is not None:
+        creds = (f"{urllib.parse.unquote(parts.username)}:"
+                 f"{urllib.parse.unquote(parts.password or '')}")
+        auth["Proxy-Authorization"] = "Basic " + base64.b64encode(creds.encode()).decode()
+    return parts.hostname + (f":{parts.port}" if parts.port else ""), auth
+
+
+def _connection(scheme, host, timeout):
+    """Pooled connection for (scheme, host), plus proxy headers to send per request.
+
+    HTTPS goes through a configured proxy with a CONNECT tunnel; plain HTTP is
+    sent to the proxy directly, with the proxy headers on each request (and the
+    absolute URL as the request target).
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    entry = conns.get((scheme, host))
+    if entry is None:
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = _proxy_for(scheme, host)
+        if proxy is None:
+            entry = cls(host, timeout=timeout), None
+        elif scheme == "https":
+            conn = cls(proxy[0], timeout=timeout)
+            conn.set_tunnel(host, headers=proxy[1])
+            entry = conn, None
+        else:
+            entry = cls(proxy[0], timeout=timeout), proxy[1]
+        conns[(scheme, host)] = entry
+    conn, proxy_headers = entry
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn, proxy_headers
+
+
+def request(url, data=None, headers=None, timeout=15):
+    """GET (or POST when data is given) a URL over a pooled keep-alive connection.
+
+    Returns the (decompressed) response body as bytes. Like
+    urllib.request.urlopen, follows redirects and raises urllib.error.HTTPError
+    for 4xx/5xx responses.
+    """
+    hdrs = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+    hdrs.update(headers or {})
+    method = "POST" if data is not None else "GET"
+
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        for attempt in range(2):
+            conn, proxy_headers = _connection(parts.scheme, parts.netloc, timeout)
+            target, req_hdrs = path, hdrs
+            if proxy_headers is not None:  # Plain HTTP through a forward proxy
+                target = f"{parts.scheme}://{parts.netloc}{path}"
+                req_hdrs = {**hdrs, **proxy_headers}
+            try:
+                conn.request(method, target, body=data, headers=req_hdrs)
+                resp = conn.getresponse()
+                body = _decode_body(resp, resp.read())
+                break
+            except _STALE_ERRORS:
+                conn.close()
+                if attempt:
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
+        if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+            url = urllib.parse.urljoin(url, resp.getheader("Location"))
+            if resp.status == 303:
+                method, data = "GET", None
+            continue
+        if resp.status >= 400:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers,
+                                         io.BytesIO(body))
+        return body
+
+    raise urllib.error.HTTPError(url, resp.status, "Too many redirects", resp.headers,
+                                 io.BytesIO(body))
+
+
+def retry_after(headers, cap=MAX_RETRY_WAIT):
+    """Seconds a rate-limited response asks us to wait, or None if it doesn't say.
+
+    Reads Retry-After (seconds or HTTP-date), Reddit's X-Ratelimit-Reset
+    (seconds until reset) and X's x-rate-limit-reset (epoch seconds).
+    The result is at least 1 and at most cap.
+    """
+    if headers is None:
+        return None
+    wait = None
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            wait = float(value)
+        except ValueError:
+            try:
+                wait = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+    if wait is None and headers.get("X-Ratelimit-Reset"):
+        try:
+            wait = float(headers["X-Ratelimit-Reset"])
+        except ValueError:
+            pass
+    if wait is None and headers.get("x-rate-limit-reset"):
+        try:
+            wait = float(headers["x-rate-limit-reset"]) - time.time()
+        except ValueError:
+            pass
+    if wait is None:
+        return None
+    return min(max(wait, 1), cap)
@@ -1,11 +1,13 @@
 """Product Hunt GraphQL API source — free, requires developer token."""
 
-import json
+import functools
 import re
 import time
-import urllib.request
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
+from .. import fastjson
+from . import http_pool
+
 
 PH_GRAPHQL_URL = "https://api.producthunt.com/v2/api/graphql"
 
@@ -61,10 +63,11 @@ query($topic: String!, $cursor: String, $postedAfter: DateTime) {
 """
 
 # GraphQL query to fetch comments for a specific post
-COMMENTS_QUERY = """
-query($postId: ID!, $cursor: String) {
-  post(id: $postId) {
-    comments(first: 10, after: $cursor, order: VOTES) {
+# Comments for several posts are fetched in one request, one aliased
+# post(id:) field per post (p0, p1, ...)
+COMMENTS_BATCH_SIZE = 10
+COMMENTS_FIELDS = """
+    comments(first: 10, order: VOTES) {
       edges {
         node {
           id
@@ -73,10 +76,7 @@ query($postId: ID!, $cursor: String) {
           createdAt
         }
       }
-    }
-  }
-}
-"""
+    }"""
 
 
 def _clean_url(url):
@@ -90,19 +90,14 @@ def _clean_url(url):
 
 def _graphql_request(query, variables, token, timeout=15):
     """Execute a GraphQL request against Product Hunt API."""
-    payload = json.dumps({"query": query, "variables": variables}).encode("utf-8")
-    req = urllib.request.Request(
-        PH_GRAPHQL_URL,
-        data=payload,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-            "User-Agent": "pain-miner/1.0",
-        },
-    )
+    payload = fastjson.dumpb({"query": query, "variables": variables})
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read())
+        return fastjson.loads(http_pool.request(PH_GRAPHQL_URL, data=payload, headers=headers,
+                                            timeout=timeout))
     except Exception as e:
         return {"errors": [{"message": str(e)}]}
 
@@ -126,8 +121,22 @@ def _guess_topic_slugs(topic):
     return list(slugs)
 
 
-def _matches_topic(post_data, topic_keywords):
+@functools.lru_cache(maxsize=64)
+def _topic_prep(topic):
+    """Per-topic keyword regex and PH slugs, computed once per topic.
+
+    The regex is an alternation of the topic's keywords (>= 2 letters), so one
+    scan answers "does any keyword appear"; it is None when there are none.
+    """
+    keywords = [w for w in re.findall(r"[a-z]+", topic.lower()) if len(w) >= 2]
+    keyword_re = re.compile("|".join(map(re.escape, keywords))) if keywords else None
+    return keyword_re, tuple(_guess_topic_slugs(topic))
+
+
+def _matches_topic(post_data, keyword_re):
     """Check if a PH post is relevant to the search topic (client-side filter)."""
+    if keyword_re is None:
+        return False
     text = (
         post_data.get("name", "") + " " +
         post_data.get("tagline", "") + " " +
@@ -135,7 +144,29 @@ def _matches_topic(post_data, topic_keywords):
     ).lower()
 
     # Check if any topic keyword appears
-    return any(kw in text for kw in topic_keywords)
+    return keyword_re.search(text) is not None
+
+
+def _build_post(node, topic, slug):
+    topic_names = [
+        t["node"]["name"]
+        for t in node.get("topics", {}).get("edges", [])
+    ]
+    return {
+        "id": f"ph_{node['id']}",
+        "platform": "producthunt",
+        "url": _clean_url(node.get("url", "")),
+        "title": node.get("name", ""),
+        "body": (node.get("tagline", "") + "\n" + node.get("description", "")).strip(),
+        "author": "",  # PH redacted maker names
+        "community": ", ".join(topic_names[:3]),
+        "points": node.get("votesCount", 0),
+        "num_comments": node.get("commentsCount", 0),
+        "created_at": node.get("createdAt", ""),
+        "topic": topic,
+        "matched_queries": [slug],
+        "website": node.get("website", ""),
+    }
 
 
 def fetch_posts(topic, cfg):
@@ -160,11 +191,8 @@ def fetch_posts(topic, cfg):
     from datetime import datetime, timedelta
     posted_after = (datetime.utcnow() - timedelta(days=days_back)).isoformat() + "Z"
 
-    # Topic keywords for client-side filtering
-    topic_keywords = [w.lower() for w in re.findall(r"[a-z]+", topic.lower()) if len(w) >= 2]
-
-    # Map topic to PH slugs
-    slugs = _guess_topic_slugs(topic)
+    # Keyword regex for client-side filtering, and the PH slugs the topic maps to
+    keyword_re, slugs = _topic_prep(topic)
     print(f"  [PH] Searching topic slugs: {', '.join(slugs)}")
 
     all_posts = {}
@@ -198,30 +226,11 @@ def fetch_posts(topic, cfg):
                     continue
 
                 # Client-side keyword filter
-                if not _matches_topic(node, topic_keywords):
+                if not _matches_topic(node, keyword_re):
                     continue
 
                 matched += 1
-                topic_names = [
-                    t["node"]["name"]
-                    for t in node.get("topics", {}).get("edges", [])
-                ]
-
-                all_posts[ph_id] = {
-                    "id": f"ph_{ph_id}",
-                    "platform": "producthunt",
-                    "url": _clean_url(node.get("url", "")),
-                    "title": node.get("name", ""),
-                    "body": (node.get("tagline", "") + "\n" + node.get("description", "")).strip(),
-                    "author": "",  # PH redacted maker names
-                    "community": ", ".join(topic_names[:3]),
-                    "points": node.get("votesCount", 0),
-                    "num_comments": node.get("commentsCount", 0),
-                    "created_at": node.get("createdAt", ""),
-                    "topic": topic,
-                    "matched_queries": [slug],
-                    "website": node.get("website", ""),
-                }
+                all_posts[ph_id] = _build_post(node, topic, slug)
 
             print(f"  [PH] ✓ topic '{slug}' page {page+1} → {len(edges)} posts, {matched} matched")
 
@@ -238,14 +247,17 @@ def fetch_posts(topic, cfg):
 
     # Enrich high-engagement posts with top comments (pain signals hide in comments)
     min_comments = ph_cfg.get("min_comments_to_fetch", 10)
+    to_enrich = [p for p in posts_list if p["num_comments"] >= min_comments]
     enriched = 0
-    for post in posts_list:
-        if post["num_comments"] >= min_comments:
-            comment_text = fetch_comments_for_post(post["id"], token)
+    for i in range(0, len(to_enrich), COMMENTS_BATCH_SIZE):
+        chunk = to_enrich[i:i + COMMENTS_BATCH_SIZE]
+        comments = fetch_comments_batch([p["id"] for p in chunk], token)
+        for post in chunk:
+            comment_text = comments.get(post["id"])
             if comment_text:
                 post["body"] += "\n\n--- User Comments ---\n" + comment_text
                 enriched += 1
-            time.sleep(delay)
+        time.sleep(delay)
 
     if enriched:
         print(f"  [PH] Enriched {enriched} posts with top comments")
@@ -253,16 +265,36 @@ def fetch_posts(topic, cfg):
     return posts_list
 
 
-def fetch_comments_for_post(post_id, token, max_comments=10):
-    """Fetch top comments for a specific PH post. Returns comment bodies joined."""
+@functools.lru_cache(maxsize=COMMENTS_BATCH_SIZE)
+def _comments_query(n):
+    """GraphQL query fetching comments for n posts, aliased p0..p{n-1}."""
+    params = ", ".join(f"$p{i}: ID!" for i in range(n))
+    fields = "\n".join(f"  p{i}: post(id: $p{i}) {{{COMMENTS_FIELDS}\n  }}" for i in range(n))
+    return f"query({params}) {{\n{fields}\n}}"
+
+
+def fetch_comments_batch(post_ids, token, max_comments=10):
+    """Fetch top comments for several PH posts in one request.
+
+    Returns {post_id: comment bodies joined}; posts the API returned nothing
+    for are omitted.
+    """
     # Strip the ph_ prefix if present
-    raw_id = post_id.replace("ph_", "")
+    variables = {f"p{i}": pid.replace("ph_", "") for i, pid in enumerate(post_ids)}
+    result = _graphql_request(_comments_query(len(post_ids)), variables, token)
 
-    result = _graphql_request(COMMENTS_QUERY, {"postId": raw_id}, token)
+    # A failed lookup nulls only its own alias, so keep whatever did resolve
+    data = result.get("data") or {}
+    out = {}
+    for i, pid in enumerate(post_ids):
+        post = data.get(f"p{i}")
+        if not post:
+            continue
+        comments = post.get("comments", {}).get("edges", [])
+        out[pid] = "\n".join(c["node"].get("body", "") for c in comments[:max_comments])
+    return out
 
-    if result.get("errors"):
-        return ""
 
-    comments = result.get("data", {}).get("post", {}).get("comments", {}).get("edges", [])
-    bodies = [c["node"].get("body", "") for c in comments[:max_comments]]
-    return "\n".join(bodies)
+def fetch_comments_for_post(post_id, token, max_comments=10):
+    """Fetch top comments for a specific PH post. Returns comment bodies joined."""
+    return fetch_comments_batch([post_id], token, max_comments).get(post_id, "")
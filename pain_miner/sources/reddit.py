@@ -1,9 +1,20 @@
 """Reddit source via .json endpoint — no API key required."""
 
-import json
+import asyncio
+import collections
+import functools
+import itertools
+import logging
+import operator
 import time
-import urllib.request
+import urllib.error
 import urllib.parse
+from datetime import datetime, timedelta
+
+from .. import db, fastjson
+from . import http_pool
+
+log = logging.getLogger(__name__)
 
 
 QUERY_TEMPLATES = [
@@ -14,54 +25,196 @@ QUERY_TEMPLATES = [
 ]
 
 
-def _fetch_json(url, params=None, user_agent="pain-miner/1.0", timeout=15):
-    """Fetch JSON from a URL with retry on 429."""
+@functools.lru_cache(maxsize=256)
+def _build_queries(topic):
+    """Search queries for a topic ({topic} is the only placeholder in the templates)."""
+    return tuple(t.replace("{topic}", topic) for t in QUERY_TEMPLATES)
+
+
+# Top comments already fetched this process: post id -> (fetched_at, comments),
+# least recently used first (also persisted in db.comment_cache). Entries
+# older than platforms.reddit.comment_cache_hours are refetched.
+_COMMENT_CACHE_SIZE = 4096
+_comment_cache = collections.OrderedDict()
+
+# The only listing fields fetch_posts reads; all but id and permalink are optional
+POST_FIELDS = ("id", "permalink", "title", "selftext", "author", "subreddit",
+               "score", "num_comments", "created_utc")
+_POST_DEFAULTS = {"title": "", "selftext": "", "author": "[deleted]", "subreddit": "",
+                  "score": 0, "num_comments": 0, "created_utc": ""}
+_post_fields = operator.itemgetter(*POST_FIELDS)
+
+
+def _slim_posts(listing):
+    """Reduce a search listing to its t3 posts, keeping only POST_FIELDS.
+
+    Missing optional fields are filled from _POST_DEFAULTS, so every post can
+    be unpacked with _post_fields.
+    """
+    posts = []
+    for child in listing.get("data", {}).get("children", []):
+        if child.get("kind") != "t3":
+            continue
+        d = child["data"]
+        post = _POST_DEFAULTS.copy()
+        post.update((k, d[k]) for k in POST_FIELDS if k in d)
+        posts.append(post)
+    return posts
+
+
+def _comment_bodies(thread, max_comments=5):
+    """The first max_comments non-deleted comment bodies of a comment thread.
+
+    Filters before limiting, so leading "more" stubs or deleted comments
+    don't crowd out real ones.
+    """
+    if not isinstance(thread, list) or len(thread) < 2:
+        return []
+    children = thread[1].get("data", {}).get("children", ())
+    bodies = (
+        body for child in children
+        if child.get("kind") == "t1"
+        and (body := child.get("data", {}).get("body", ""))
+        and body not in ("[deleted]", "[removed]")
+    )
+    return list(itertools.islice(bodies, max_comments))
+
+
+def _get_json(url, user_agent, timeout, extract=None):
+    data = fastjson.loads(http_pool.request(url, headers={"User-Agent": user_agent},
+                                            timeout=timeout))
+    return extract(data) if extract else data
+
+
+async def _fetch_json(url, params=None, user_agent="pain-miner/1.0", timeout=15, extract=None):
+    """Fetch JSON from a URL with retry on 429.
+
+    The blocking request runs in a worker thread so other fetches proceed.
+    `extract` is applied in that thread, so the full payload is dropped there
+    and only what it returns is kept.
+    """
     if params:
         url = f"{url}?{urllib.parse.urlencode(params)}"
 
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            req = urllib.request.Request(url, headers={"User-Agent": user_agent})
-            with urllib.request.urlopen(req, timeout=timeout) as resp:
-                return json.loads(resp.read())
+            return await asyncio.to_thread(_get_json, url, user_agent, timeout, extract)
         except urllib.error.HTTPError as e:
             if e.code == 429 and attempt < max_retries - 1:
-                wait = 2 ** (attempt + 1)
-                print(f"  [Reddit] Rate limited, waiting {wait}s...")
-                time.sleep(wait)
+                # Wait as long as the server says; exponential backoff otherwise
+                wait = http_pool.retry_after(e.headers) or 2 ** (attempt + 1)
+                log.warning("  [Reddit] Rate limited, waiting %.0fs...", wait)
+                await asyncio.sleep(wait)
                 continue
             raise
         except Exception:
             if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+                await asyncio.sleep(2 ** attempt)
                 continue
             raise
     return {}
 
 
-def _fetch_comments(post_id, subreddit, user_agent="pain-miner/1.0", delay=1.5):
-    """Fetch top 5 comments for a Reddit post via .json endpoint."""
-    url = f"https://www.reddit.com/r/{subreddit}/comments/{post_id}.json"
+class _RateLimiter:
+    """Shared throttle for one event loop: at most max_in_flight requests at
+    once, and request starts spaced at least `interval` seconds apart.
+    """
+
+    def __init__(self, interval, max_in_flight):
+        self.interval = interval
+        self._sem = asyncio.Semaphore(max_in_flight)
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        # Reserve the next start slot before sleeping, so waiters queue up in order
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self.interval
+        try:
+            if start > now:
+                await asyncio.sleep(start - now)
+        except BaseException:
+            self._sem.release()
+            raise
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+
+async def _paced_fetch(limiter, url, params=None, user_agent="pain-miner/1.0", extract=None):
+    """_fetch_json through the shared rate limiter."""
+    async with limiter:
+        return await _fetch_json(url, params=params, user_agent=user_agent, extract=extract)
+
+
+def _remember_comments(post_id, fetched_at, comments):
+    _comment_cache[post_id] = (fetched_at, comments)
+    _comment_cache.move_to_end(post_id)
+    if len(_comment_cache) > _COMMENT_CACHE_SIZE:
+        _comment_cache.popitem(last=False)
+
+
+def _cached_comments(post_id, max_age_hours):
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    entry = _comment_cache.get(post_id)
+    if entry is not None:
+        if entry[0] >= cutoff:
+            _comment_cache.move_to_end(post_id)
+            return entry[1]
+        del _comment_cache[post_id]
     try:
-        time.sleep(delay)
-        data = _fetch_json(url, user_agent=user_agent)
-        if not isinstance(data, list) or len(data) < 2:
-            return []
-        comments = []
-        for child in data[1].get("data", {}).get("children", [])[:5]:
-            if child.get("kind") != "t1":
-                continue
-            body = child.get("data", {}).get("body", "")
-            if body and body != "[deleted]" and body != "[removed]":
-                comments.append(body)
+        cached = db.get_cached_comments(f"reddit:{post_id}", max_age_hours)
+    except Exception:  # Cache is best effort (e.g. db not initialised)
+        return None
+    if cached is None:
+        return None
+    comments, fetched_at = cached
+    _remember_comments(post_id, fetched_at, comments)
+    return comments
+
+
+def _store_comments(post_id, comments):
+    _remember_comments(post_id, datetime.utcnow(), comments)
+    try:
+        db.save_cached_comments(f"reddit:{post_id}", comments)
+    except Exception:
+        pass
+
+
+async def _fetch_comments(limiter, post_id, subreddit, user_agent="pain-miner/1.0",
+                          cache_hours=24):
+    """Fetch top 5 comments for a Reddit post via .json endpoint.
+
+    Cached hits return without a request (or a rate-limit wait); only
+    successful fetches are cached.
+    """
+    comments = _cached_comments(post_id, cache_hours)
+    if comments is not None:
         return comments
+    url = f"https://www.reddit.com/r/{subreddit}/comments/{post_id}.json"
+    try:
+        comments = await _paced_fetch(limiter, url, user_agent=user_agent,
+                                      extract=_comment_bodies)
     except Exception:
         return []
+    _store_comments(post_id, comments)
+    return comments
 
 
 def fetch_posts(topic, cfg, subreddits=None):
     """Search Reddit for pain-signal posts about a topic via .json endpoint."""
+    return asyncio.run(_fetch_posts_async(topic, cfg, subreddits))
+
+
+async def _fetch_posts_async(topic, cfg, subreddits=None):
+    """All searches start at once; each search's comment fetches start as soon
+    as that search is processed, overlapping the searches still in flight.
+
+    One shared limiter caps in-flight requests at search.parallel_queries and
+    starts at most one request per `delay` seconds.
+    """
     r_cfg = cfg["platforms"]["reddit"]
     subs = subreddits or r_cfg.get("default_subreddits", ["SaaS", "startups"])
     sub_str = "+".join(subs)
@@ -70,69 +223,75 @@ def fetch_posts(topic, cfg, subreddits=None):
     limit = r_cfg.get("limit", 100)
     user_agent = r_cfg.get("user_agent", "pain-miner/1.0")
     comment_threshold = r_cfg.get("comment_threshold", 10)
+    cache_hours = r_cfg.get("comment_cache_hours", 24)
+    # Bodies are cut to ANALYSIS_BODY_LIMIT on insert, so comments past it are never seen
+    body_budget = min(cfg["search"].get("body_char_budget", db.ANALYSIS_BODY_LIMIT),
+                      db.ANALYSIS_BODY_LIMIT)
     delay = max(cfg["search"].get("query_delay_seconds", 0.3), 1.5)
+    limiter = _RateLimiter(delay, max(1, cfg["search"].get("parallel_queries", 4)))
 
-    queries = [t.format(topic=topic) for t in QUERY_TEMPLATES]
+    queries = _build_queries(topic)
     all_posts = {}
-    seen_ids = set()
+    comment_tasks = []  # (post_id, task) for high-engagement posts
+
+    url = f"https://www.reddit.com/r/{sub_str}/search.json"
+    searches = [
+        asyncio.create_task(_paced_fetch(limiter, url, params={
+            "q": q,
+            "sort": sort,
+            "t": time_filter,
+            "limit": limit,
+            "restrict_sr": "on",
+        }, user_agent=user_agent, extract=_slim_posts))
+        for q in queries
+    ]
 
-    for q in queries:
+    # Results are handled in query order, so tagging matches the serial version
+    for q, search in zip(queries, searches):
         try:
-            url = f"https://www.reddit.com/r/{sub_str}/search.json"
-            params = {
-                "q": q,
-                "sort": sort,
-                "t": time_filter,
-                "limit": limit,
-                "restrict_sr": "on",
-            }
-            data = _fetch_json(url, params=params, user_agent=user_agent)
-            children = data.get("data", {}).get("children", [])
+            listing = await search
 
             count = 0
-            for child in children:
-                if child.get("kind") != "t3":
-                    continue
-                p = child["data"]
-                post_id = p["id"]
-                if post_id in seen_ids:
+            for p in listing:
+                (post_id, permalink, title, selftext, author, subreddit,
+                 score, num_comments, created_utc) = _post_fields(p)
+                if post_id in all_posts:
                     # Tag additional matched query
-                    if post_id in all_posts:
-                        all_posts[post_id]["matched_queries"].append(q)
+                    all_posts[post_id]["matched_queries"].append(q)
                     continue
-                seen_ids.add(post_id)
-
-                body = p.get("selftext", "") or ""
 
-                # Fetch top comments for high-engagement posts
-                if p.get("num_comments", 0) >= comment_threshold:
-                    subreddit = p.get("subreddit", sub_str.split("+")[0])
-                    top_comments = _fetch_comments(post_id, subreddit,
-                                                   user_agent=user_agent, delay=delay)
-                    if top_comments:
-                        body += "\n\n--- TOP COMMENTS ---\n" + "\n---\n".join(top_comments)
+                # Fetch top comments for high-engagement posts, unless the
+                # post text alone already fills the body budget
+                if num_comments >= comment_threshold and len(selftext or "") < body_budget:
+                    comment_tasks.append((post_id, asyncio.create_task(_fetch_comments(
+                        limiter, post_id, subreddit or sub_str.split("+")[0],
+                        user_agent=user_agent, cache_hours=cache_hours))))
 
                 all_posts[post_id] = {
                     "id": f"reddit_{post_id}",
                     "platform": "reddit",
-                    "url": f"https://reddit.com{p['permalink']}",
-                    "title": p.get("title", ""),
-                    "body": body,
-                    "author": p.get("author", "[deleted]"),
-                    "community": p.get("subreddit", ""),
-                    "points": p.get("score", 0),
-                    "num_comments": p.get("num_comments", 0),
-                    "created_at": str(p.get("created_utc", "")),
+                    "url": f"https://reddit.com{permalink}",
+                    "title": title,
+                    "body": selftext or "",
+                    "author": author,
+                    "community": subreddit,
+                    "points": score,
+                    "num_comments": num_comments,
+                    "created_at": str(created_utc),
                     "topic": topic,
                     "matched_queries": [q],
                 }
                 count += 1
 
-            print(f"  [Reddit] ✓ '{q[:60]}...' → {count} new posts")
+            if log.isEnabledFor(logging.INFO):
+                log.info("  [Reddit] ✓ '%s...' → %d new posts", q[:60], count)
 
         except Exception as e:
-            print(f"  [Reddit] ✗ '{q[:60]}...' → {e}")
+            log.warning("  [Reddit] ✗ '%s...' → %s", q[:60], e)
 
-        time.sleep(delay)
+    comment_lists = await asyncio.gather(*(task for _, task in comment_tasks))
+    for (post_id, _), top_comments in zip(comment_tasks, comment_lists):
+        if top_comments:
+            all_posts[post_id]["body"] += "\n\n--- TOP COMMENTS ---\n" + "\n---\n".join(top_comments)
 
     return list(all_posts.values())
@@ -1,13 +1,22 @@
 """X (Twitter) API v2 source — requires API key (Basic/$200/mo or pay-per-use)."""
 
-import json
+import functools
+import logging
 import re
-import time
-import urllib.request
+import urllib.error
 import urllib.parse
 
+from .. import fastjson
+from . import http_pool
+
+log = logging.getLogger(__name__)
+
 
 X_SEARCH_URL = "https://api.x.com/2/tweets/search/recent"
+# Only query and max_results vary between searches
+_X_QUERY_FILTERS = " -is:retweet lang:en"
+_X_FIELDS_PARAM = "&tweet.fields=" + urllib.parse.quote_plus(
+    "created_at,public_metrics,author_id,conversation_id")
 
 # Search query templates — {topic} gets replaced
 QUERY_TEMPLATES = [
@@ -18,25 +27,59 @@ QUERY_TEMPLATES = [
 ]
 
 
+def _template_terms(template):
+    """The OR-ed terms of a template's (...) clause, quotes kept."""
+    clause = template[template.index("(") + 1:template.rindex(")")]
+    return clause.split(" OR ")
+
+
+def _compile_tagger(templates):
+    """Map each lowercased term to the template indexes that contain it, plus one
+    regex that finds every term occurrence in a single scan (the lookahead lets
+    matches overlap, as separate per-template searches would).
+    """
+    term_templates = {}
+    for i, t in enumerate(templates):
+        for term in _template_terms(t):
+            term_templates.setdefault(term.strip('"').lower(), set()).add(i)
+    alternation = "|".join(map(re.escape, sorted(term_templates, key=len, reverse=True)))
+    return term_templates, re.compile(rf"(?=\b({alternation})\b)", re.IGNORECASE)
+
+
+# All templates are sent as one OR-combined search; each tweet is then tagged
+# with the template queries whose terms it contains
+_TERM_TEMPLATES, _TERMS_RE = _compile_tagger(QUERY_TEMPLATES)
+
+
+def _matched_templates(text):
+    """Indexes of the templates with at least one term in text."""
+    hits = set()
+    for m in _TERMS_RE.finditer(text):
+        hits |= _TERM_TEMPLATES[m.group(1).lower()]
+    return hits
+
+
+@functools.lru_cache(maxsize=256)
+def _build_queries(topic):
+    """Search queries for a topic ({topic} is the only placeholder in the templates)."""
+    return tuple(t.replace("{topic}", topic) for t in QUERY_TEMPLATES)
+
+
+@functools.lru_cache(maxsize=256)
+def _combined_query(topic):
+    """All templates' terms OR-ed into a single search query for a topic."""
+    terms = [term for t in QUERY_TEMPLATES for term in _template_terms(t)]
+    return f'"{topic}" ({" OR ".join(terms)})'
+
+
 def _search_tweets(query, bearer_token, max_results=50, timeout=15):
     """Search recent tweets using X API v2."""
-    params = urllib.parse.urlencode({
-        "query": f"{query} -is:retweet lang:en",
-        "max_results": min(max_results, 100),
-        "tweet.fields": "created_at,public_metrics,author_id,conversation_id",
-    })
-    url = f"{X_SEARCH_URL}?{params}"
-
-    req = urllib.request.Request(
-        url,
-        headers={
-            "Authorization": f"Bearer {bearer_token}",
-            "User-Agent": "pain-miner/1.0",
-        },
-    )
+    url = (f"{X_SEARCH_URL}?query={urllib.parse.quote_plus(query + _X_QUERY_FILTERS)}"
+           f"&max_results={min(max_results, 100)}{_X_FIELDS_PARAM}")
+
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read())
+        return fastjson.loads(http_pool.request(
+            url, headers={"Authorization": f"Bearer {bearer_token}"}, timeout=timeout))
     except urllib.error.HTTPError as e:
         body = e.read().decode("utf-8", errors="replace")
         return {"errors": [{"message": f"HTTP {e.code}: {body[:200]}"}]}
@@ -53,51 +96,54 @@ def fetch_tweets(topic, cfg):
     x_cfg = cfg["platforms"].get("twitter", {})
     bearer_token = x_cfg.get("bearer_token", "")
     if not bearer_token:
-        print("  [X] No bearer token. Set X_BEARER_TOKEN env var.")
+        log.warning("  [X] No bearer token. Set X_BEARER_TOKEN env var.")
         return []
 
-    delay = cfg["search"].get("query_delay_seconds", 1.0)  # X rate limits are stricter
     max_results = x_cfg.get("max_results_per_query", 50)
 
-    queries = [t.format(topic=topic) for t in QUERY_TEMPLATES]
-    all_tweets = {}
+    # One request instead of one per template (each is billed and rate limited);
+    # the per-query budget is pooled, and _search_tweets caps it at 100
+    queries = _build_queries(topic)
+    combined = _combined_query(topic)
+    result = _search_tweets(combined, bearer_token,
+                            max_results=max_results * len(queries))
 
-    for q in queries:
-        result = _search_tweets(q, bearer_token, max_results=max_results)
+    if result.get("errors"):
+        msgs = [e.get("message", "unknown") for e in result["errors"]]
+        log.warning("  [X] ✗ query failed → %s", "; ".join(msgs)[:100])
+        return []
 
-        if result.get("errors"):
-            msgs = [e.get("message", "unknown") for e in result["errors"]]
-            print(f"  [X] ✗ query failed → {'; '.join(msgs)[:100]}")
+    tweets = result.get("data", [])
+    meta = result.get("meta", {})
+    total = meta.get("result_count", len(tweets))
+
+    all_tweets = {}
+    for t in tweets:
+        tid = t["id"]
+        if tid in all_tweets:
             continue
 
-        tweets = result.get("data", [])
-        meta = result.get("meta", {})
-        total = meta.get("result_count", len(tweets))
-
-        matched = 0
-        for t in tweets:
-            tid = t["id"]
-            if tid in all_tweets:
-                continue
-
-            metrics = t.get("public_metrics", {})
-            matched += 1
-            all_tweets[tid] = {
-                "id": f"x_{tid}",
-                "platform": "twitter",
-                "url": f"https://x.com/i/status/{tid}",
-                "title": "",
-                "body": t.get("text", ""),
-                "author": t.get("author_id", ""),
-                "community": "twitter",
-                "points": metrics.get("like_count", 0) + metrics.get("retweet_count", 0),
-                "num_comments": metrics.get("reply_count", 0),
-                "created_at": t.get("created_at", ""),
-                "topic": topic,
-                "matched_queries": [q],
-            }
-
-        print(f"  [X] ✓ '{q[:60]}...' → {total} results, {matched} new")
-        time.sleep(delay)
+        text = t.get("text", "")
+        hits = _matched_templates(text)
+        matched_queries = [q for i, q in enumerate(queries) if i in hits]
+        metrics = t.get("public_metrics", {})
+        all_tweets[tid] = {
+            "id": f"x_{tid}",
+            "platform": "twitter",
+            "url": f"https://x.com/i/status/{tid}",
+            "title": "",
+            "body": text,
+            "author": t.get("author_id", ""),
+            "community": "twitter",
+            "points": metrics.get("like_count", 0) + metrics.get("retweet_count", 0),
+            "num_comments": metrics.get("reply_count", 0),
+            "created_at": t.get("created_at", ""),
+            "topic": topic,
+            # X may match on text we don't see (e.g. expanded URLs)
+            "matched_queries": matched_queries or [combined],
+        }
+
+    if log.isEnabledFor(logging.INFO):
+        log.info("  [X] ✓ '%s...' → %d results, %d new", combined[:60], total, len(all_tweets))
 
     return list(all_tweets.values())